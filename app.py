@@ -3,31 +3,44 @@ import os
 from services.health_score_service import HealthScoreService
 from services.health_score_orchestration_service import HealthScoreOrchestrationService
 from services.chart_generation_service import ChartGenerationService
-from services.pdf_report_service import PdfReportService
+from services.pdf_report_service import PDF_WORKERS, PdfReportService
 from services.json_processing_service import JsonProcessingService
 from services.email_service import EmailService
+from services.email_queue import EmailQueue
+from services.job_service import JobService
+from services.artifact_cache import DiskLRU
 from routes import blueprints
+from routes.responses import FastJSONProvider
 from routes.webhook_routes import init_routes as init_webhook_routes
 from routes.file_routes import init_routes as init_file_routes
 from routes.report_routes import init_routes as init_report_routes
 
+# Project root, resolved once at import
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__, static_folder='static')
+    app.json = FastJSONProvider(app)
     
     # Configuration
-    JSON_STORAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'JsonData')
-    PDF_STORAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'PdfData')
+    JSON_STORAGE_PATH = os.path.join(_HERE, 'JsonData')
+    PDF_STORAGE_PATH = os.path.join(_HERE, 'PdfData')
     
     # Ensure directories exist
     os.makedirs(JSON_STORAGE_PATH, exist_ok=True)
     os.makedirs(PDF_STORAGE_PATH, exist_ok=True)
     
+    # Generated charts and reports share a size-bounded store
+    artifact_cache = DiskLRU(PDF_STORAGE_PATH, int(os.getenv('ARTIFACT_CACHE_MAX_MB', '1024')) * 1024 * 1024)
+    
     # Initialize services
     health_score_service = HealthScoreService()
-    chart_service = ChartGenerationService()
-    pdf_service = PdfReportService()
+    chart_service = ChartGenerationService(artifact_cache)
+    pdf_service = PdfReportService(artifact_cache, int(os.getenv('PDF_WORKERS', PDF_WORKERS)))
     email_service = EmailService()
+    email_queue = EmailQueue(email_service)
+    job_service = JobService(os.path.join(PDF_STORAGE_PATH, '.jobs.sqlite3'))
     orchestration_service = HealthScoreOrchestrationService(chart_service, pdf_service)
     json_processing_service = JsonProcessingService(health_score_service, orchestration_service)
     
@@ -35,8 +48,8 @@ def create_app():
     app.config['email_service'] = email_service
     
     # Initialize route dependencies
-    init_webhook_routes(JSON_STORAGE_PATH, json_processing_service, email_service)
-    init_file_routes(JSON_STORAGE_PATH, json_processing_service, email_service)
+    init_webhook_routes(JSON_STORAGE_PATH, json_processing_service, email_service, job_service, PDF_STORAGE_PATH)
+    init_file_routes(JSON_STORAGE_PATH, json_processing_service, email_service, email_queue, chart_service)
     init_report_routes(PDF_STORAGE_PATH)
     
     # Register blueprints
@@ -1,6 +1,45 @@
 import os
-import json
 from datetime import datetime
+from functools import lru_cache
+from utils import fastjson
+from utils.typeform import extract_email
+
+def _file_entry(entry):
+    """
+    Build the metadata dictionary for a directory entry
+    
+    Args:
+        entry: os.DirEntry for a JSON file
+        
+    Returns:
+        Dictionary with file name, creation time and size
+    """
+    stat = entry.stat()
+    return {
+        'name': entry.name,
+        'createdAt': datetime.fromtimestamp(stat.st_ctime).isoformat(),
+        'size': stat.st_size
+    }
+
+@lru_cache(maxsize=8)
+def _list_files_sorted(storage_path, mtime_ns):
+    """
+    List JSON file metadata in a directory, newest first
+    
+    Args:
+        storage_path: Directory to list
+        mtime_ns: Directory modification time, used only as part of the cache key
+        
+    Returns:
+        Tuple of file metadata dictionaries
+    """
+    with os.scandir(storage_path) as it:
+        entries = [entry for entry in it if entry.name.endswith('.json')]
+    
+    # Sort by creation time (newest first)
+    entries.sort(key=lambda entry: entry.stat().st_ctime, reverse=True)
+    
+    return tuple(_file_entry(entry) for entry in entries)
 
 class FileController:
     """Controller for file-related operations"""
@@ -14,8 +53,23 @@ class FileController:
             json_processing_service: Service to process JSON data
         """
         self.json_storage_path = json_storage_path
+        # Storage directory with a trailing separator, for joining sanitized filenames
+        self._base = os.path.join(json_storage_path, '')
         self.json_processing_service = json_processing_service
     
+    def _resolve(self, filename):
+        """
+        Map a requested filename to a file inside the storage directory
+        
+        Args:
+            filename: Requested file name (any directory components are dropped)
+            
+        Returns:
+            Path to the existing file, or None
+        """
+        file_path = self._base + os.path.basename(filename)
+        return file_path if os.path.isfile(file_path) else None
+    
     def list_files(self):
         """
         List all JSON files in the storage directory
@@ -24,24 +78,13 @@ class FileController:
             Dictionary with list of files and metadata
         """
         try:
-            # Get all JSON files in the storage directory
-            files = []
-            for filename in os.listdir(self.json_storage_path):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(self.json_storage_path, filename)
-                    stat = os.stat(file_path)
-                    files.append({
-                        'name': filename,
-                        'createdAt': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                        'size': stat.st_size
-                    })
-            
-            # Sort by creation time (newest first)
-            files.sort(key=lambda x: x['createdAt'], reverse=True)
+            # The directory mtime only changes when files are added or removed,
+            # so it keys the cached listing
+            mtime_ns = os.stat(self.json_storage_path).st_mtime_ns
             
             return {
                 'success': True,
-                'files': files
+                'files': list(_list_files_sorted(self.json_storage_path, mtime_ns))
             }
         except Exception as e:
             return {
@@ -50,6 +93,37 @@ class FileController:
                 'details': str(e)
             }, 500
     
+    def iter_files(self):
+        """
+        Lazily yield metadata for each JSON file in the storage directory
+        
+        Files are yielded in directory order rather than sorted, so memory use
+        stays constant regardless of how many files are stored.
+        
+        Yields:
+            Dictionary with file name, creation time and size
+        """
+        with os.scandir(self.json_storage_path) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    yield _file_entry(entry)
+    
+    def get_file_etag(self, filename):
+        """
+        Compute a weak ETag for a stored JSON file from its size and mtime
+        
+        Args:
+            filename: Name of the file
+            
+        Returns:
+            ETag value (without quotes or weak prefix), or None if the file does not exist
+        """
+        try:
+            stat = os.stat(self._base + os.path.basename(filename))
+        except OSError:
+            return None
+        return f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+    
     def get_file_content(self, filename):
         """
         Get content of a specific JSON file
@@ -62,22 +136,21 @@ class FileController:
         """
         try:
             # Sanitize filename to prevent directory traversal
-            filename = os.path.basename(filename)
-            file_path = os.path.join(self.json_storage_path, filename)
+            file_path = self._resolve(filename)
             
-            if not os.path.exists(file_path):
+            if file_path is None:
                 return {
                     'success': False,
                     'error': 'File not found'
                 }, 404
             
             # Read file content
-            with open(file_path, 'r') as f:
-                content = json.load(f)
+            with open(file_path, 'rb') as f:
+                content = fastjson.loads(f.read())
             
             return {
                 'success': True,
-                'fileName': filename,
+                'fileName': os.path.basename(file_path),
                 'content': content
             }
         except Exception as e:
@@ -100,49 +173,120 @@ class FileController:
         """
         try:
             # Sanitize filename
-            filename = os.path.basename(filename)
-            file_path = os.path.join(self.json_storage_path, filename)
+            file_path = self._resolve(filename)
             
-            if not os.path.exists(file_path):
+            if file_path is None:
                 return {
                     'success': False,
                     'error': 'File not found'
                 }, 404
             
             # Read file content
-            with open(file_path, 'r') as f:
+            with open(file_path, 'rb') as f:
                 json_content = f.read()
             
             # Process the JSON
-            result = self.json_processing_service.process_json(json_content, filename)
-            
-            if result.get('success') and result.get('data'):
-                data = result.get('data', {})
-                pdf_path = data.get('pdf_report_path', '')
-                chart_path = data.get('chart_path', '')
-                
-                # Create response based on requested format
-                if output_format == 'html':
-                    return {
-                        'success': result.get('success'),
-                        'message': result.get('message'),
-                        'chartUrl': f'/api/view-chart?path={chart_path}',
-                        'data': data
-                    }
-                else:  # Default to PDF
-                    return {
-                        'success': result.get('success'),
-                        'message': result.get('message'),
-                        'pdfUrl': f'/api/download-pdf?path={pdf_path}',
-                        'chartUrl': f'/api/view-chart?path={chart_path}',
-                        'pdfPath': pdf_path,  # Add actual path for email functionality
-                        'data': data
-                    }
-            
-            return result
+            result = self.json_processing_service.process_json(json_content, os.path.basename(file_path))
+            
+            return self._format_process_result(result, output_format)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': 'Failed to process file',
+                'details': str(e)
+            }, 500
+    
+    def read_and_process(self, filename, output_format='pdf', fallback_email=None):
+        """
+        Read a JSON file once, extract the recipient email and process it
+        
+        The file is opened and parsed a single time; the parsed payload is
+        used both for the email lookup and for processing.
+        
+        Args:
+            filename: Name of the file to process
+            output_format: Format for the output (pdf or html)
+            fallback_email: Email address to use if none is found in the file
+            
+        Returns:
+            Dictionary with processing results plus the parsed 'content' and
+            the resolved 'toEmail', or an error tuple
+        """
+        # Sanitize filename
+        filename = os.path.basename(filename)
+        file_path = self._base + filename
+        
+        try:
+            with open(file_path, 'rb') as f:
+                content = fastjson.loads(f.read())
+        except Exception:
+            return {
+                'success': False,
+                'error': 'File not found or could not be read',
+                'details': 'The specified file does not exist or could not be read'
+            }, 404
+        
+        # Extract email from the file content, falling back to the provided address
+        to_email = None
+        if isinstance(content, dict):
+            to_email = extract_email(content)
+        if not to_email:
+            to_email = fallback_email
+        
+        if not to_email:
+            return {
+                'success': False,
+                'error': 'No email address found',
+                'details': 'Could not extract email from file and no email provided as query parameter'
+            }, 400
+        
+        try:
+            # Process the already parsed payload
+            result = self.json_processing_service.process_json_obj(content, filename)
+            
+            response = self._format_process_result(result, output_format)
+            response['content'] = content
+            response['toEmail'] = to_email
+            return response
         except Exception as e:
             return {
                 'success': False,
                 'error': 'Failed to process file',
                 'details': str(e)
             }, 500
+    
+    def _format_process_result(self, result, output_format):
+        """
+        Shape a processing result into the response for the requested format
+        
+        Args:
+            result: Result dictionary from the processing service
+            output_format: Format for the output (pdf or html)
+            
+        Returns:
+            Response dictionary
+        """
+        if result.get('success') and result.get('data'):
+            data = result.get('data', {})
+            pdf_path = data.get('pdf_report_path', '')
+            chart_path = data.get('chart_path', '')
+            
+            # Create response based on requested format
+            if output_format == 'html':
+                return {
+                    'success': result.get('success'),
+                    'message': result.get('message'),
+                    'chartUrl': f'/api/view-chart?path={chart_path}',
+                    'data': data
+                }
+            else:  # Default to PDF
+                return {
+                    'success': result.get('success'),
+                    'message': result.get('message'),
+                    'pdfUrl': f'/api/download-pdf?path={pdf_path}',
+                    'chartUrl': f'/api/view-chart?path={chart_path}',
+                    'pdfPath': pdf_path,  # Add actual path for email functionality
+                    'data': data
+                }
+        
+        return result
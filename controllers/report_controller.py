@@ -1,7 +1,7 @@
 import os
 from services.pdf_report_service import PdfReportService
 from services.chart_generation_service import ChartGenerationService
-from models import PillarScores
+from models import PillarScores, RouteResult
 
 class ReportController:
     """Controller for report-related operations"""
@@ -17,6 +17,28 @@ class ReportController:
         self.pdf_service = PdfReportService()
         self.chart_service = ChartGenerationService()
     
+    def _open_file(self, path, mimetype, as_attachment=False):
+        """
+        Open a generated file for the route to serve
+        
+        Args:
+            path: Path to the file
+            mimetype: Content type of the file
+            as_attachment: Whether to send the file as a download
+            
+        Returns:
+            RouteResult holding the open file, or None if it cannot be opened
+        """
+        if not path:
+            return None
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+        
+        return RouteResult('file', f, mimetype=mimetype, as_attachment=as_attachment,
+                           path=path, stat=os.fstat(f.fileno()))
+    
     def download_pdf(self, path):
         """
         Handle PDF download request
@@ -25,24 +47,25 @@ class ReportController:
             path: Path to the PDF file
             
         Returns:
-            Path to the PDF file or error message
+            RouteResult serving the PDF file, or with an error message
         """
         try:
-            if not path or not os.path.exists(path):
-                # If path is not provided or doesn't exist, return error
-                return {
+            result = self._open_file(path, 'application/pdf', as_attachment=True)
+            if result is None:
+                # If path is not provided or can't be opened, return error
+                return RouteResult('json', {
                     'success': False,
                     'message': 'PDF file not found or path is invalid'
-                }, 404
+                }, 404)
             
-            # Return the actual PDF file path for the route to serve
-            return path
+            # Return the opened PDF file for the route to serve
+            return result
         except Exception as e:
-            return {
+            return RouteResult('json', {
                 'success': False,
                 'error': 'Failed to download PDF',
                 'details': str(e)
-            }, 500
+            }, 500)
     
     def view_chart(self, path):
         """
@@ -52,22 +75,23 @@ class ReportController:
             path: Path to the chart file
             
         Returns:
-            The chart file or error message
+            RouteResult serving the chart file, or with an error message
         """
         try:
-            if not path or not os.path.exists(path):
+            result = self._open_file(path, 'image/png')
+            if result is None:
                 # Return an error message if the path is invalid
-                return {
+                return RouteResult('json', {
                     'success': False,
                     'message': 'Chart file not found or path is invalid',
                     'path': path
-                }, 404
+                }, 404)
             
-            # Return the actual chart file
-            return path
+            # Return the opened chart file
+            return result
         except Exception as e:
-            return {
+            return RouteResult('json', {
                 'success': False,
                 'error': 'Failed to view chart',
                 'details': str(e)
-            }, 500
+            }, 500)
@@ -1,23 +1,84 @@
 import os
-import json
-import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from utils import fastjson
+from utils.naming import unique_filename, utc_date
+from utils.typeform import EMAIL_REF, extract_email
+
+# Largest number of payloads accepted in one NDJSON batch
+MAX_BATCH_SIZE = 100
+
+# Saved payloads are only kept for auditing, so disk writes run in the
+# background while the request thread carries on with processing
+_io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='webhook-io')
+
+def _log_write_error(future):
+    """Report a failed background payload write"""
+    error = future.exception()
+    if error is not None:
+        print(f"Error saving webhook payload: {error}")
 
 class WebhookController:
     """Controller for webhook-related operations"""
     
-    def __init__(self, json_storage_path, json_processing_service, email_service):
+    def __init__(self, json_storage_path, json_processing_service, email_service, job_service):
         """
         Initialize the controller with required dependencies
         
         Args:
             json_storage_path: Path to store JSON files
             json_processing_service: Service to process JSON data
+            email_service: Service to build and send emails
+            job_service: Service that runs webhook processing in the background
         """
         self.json_storage_path = json_storage_path
+        # Storage directory with a trailing separator, for joining sanitized filenames
+        self._base = os.path.join(json_storage_path, '')
         self.json_processing_service = json_processing_service
         self.email_service = email_service
+        self.job_service = job_service
+        
+    def _ingest(self, payload):
+        """
+        Save the payload and run it through the processing pipeline
         
+        The payload is serialized exactly once, by the background disk write,
+        and processed from the in-memory dictionary.
+        
+        Args:
+            payload: JSON payload from webhook
+            
+        Returns:
+            Tuple of (filename, write future, processing result)
+        """
+        # Generate a unique filename
+        filename = unique_filename('Webhook', 'json')
+        filepath = self._base + filename
+        
+        # Save JSON to file in the background
+        write_future = _io_pool.submit(fastjson.dump_to_file, payload, filepath)
+        write_future.add_done_callback(_log_write_error)
+        
+        # Process the already parsed payload immediately
+        processing_result = self.json_processing_service.process_json_obj(payload)
+        
+        return filename, write_future, processing_result
+    
+    def _generated_pdf_path(self, processing_result):
+        """
+        Get the path of the PDF produced by a successful processing run
+        
+        Args:
+            processing_result: Result dictionary from the processing service
+            
+        Returns:
+            Path to the existing PDF file, or None
+        """
+        if processing_result.get('success') and 'data' in processing_result:
+            pdf_path = processing_result['data'].get('pdf_report_path')
+            if pdf_path and os.path.exists(pdf_path):
+                return pdf_path
+        return None
+    
     def _extract_email_from_payload(self, payload):
         """
         Extract email address from payload with reference ID 39f116ed-5403-407a-b506-c9625e9e6b2a
@@ -29,15 +90,7 @@ class WebhookController:
             Email address if found, None otherwise
         """
         try:
-            # Check if payload has form_response structure
-            if 'form_response' in payload and 'answers' in payload['form_response']:
-                # Look for email field with specific reference ID
-                for answer in payload['form_response']['answers']:
-                    if answer.get('type') == 'email' and \
-                       'field' in answer and \
-                       answer['field'].get('ref') == '39f116ed-5403-407a-b506-c9625e9e6b2a':
-                        return answer.get('email')
-            return None
+            return extract_email(payload)
         except Exception as e:
             print(f"Error extracting email: {e}")
             return None
@@ -53,17 +106,7 @@ class WebhookController:
             Dictionary with processing results and metadata
         """
         try:
-            # Generate a unique filename
-            filename = f"Webhook_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.json"
-            filepath = os.path.join(self.json_storage_path, filename)
-            
-            # Save JSON to file
-            with open(filepath, 'w') as f:
-                json.dump(payload, f, indent=2)
-            
-            # Process the JSON immediately
-            json_content = json.dumps(payload)
-            processing_result = self.json_processing_service.process_json(json_content)
+            filename, _, processing_result = self._ingest(payload)
             
             # Return response
             return {
@@ -79,6 +122,45 @@ class WebhookController:
                 'details': str(e)
             }, 500
     
+    def process_webhook_batch(self, body):
+        """
+        Process a batch of webhook payloads sent as newline-delimited JSON
+        
+        Args:
+            body: Raw request body with one JSON payload per line
+            
+        Returns:
+            Dictionary with one result per payload, or error information
+        """
+        lines = [line for line in body.split(b'\n') if line.strip()]
+        if len(lines) > MAX_BATCH_SIZE:
+            return {
+                'success': False,
+                'error': 'Batch too large',
+                'details': f'A batch may contain at most {MAX_BATCH_SIZE} payloads, got {len(lines)}'
+            }, 413
+        
+        results = []
+        for line in lines:
+            try:
+                payload = fastjson.loads(line)
+            except fastjson.JSONDecodeError as e:
+                results.append({
+                    'success': False,
+                    'error': 'Invalid JSON payload',
+                    'details': str(e)
+                })
+                continue
+            
+            result = self.process_webhook(payload)
+            results.append(result[0] if isinstance(result, tuple) else result)
+        
+        return {
+            'success': all(result.get('success') for result in results),
+            'count': len(results),
+            'results': results
+        }
+    
     def process_webhook_to_pdf(self, payload):
         """
         Process incoming webhook data and generate PDF directly
@@ -90,30 +172,21 @@ class WebhookController:
             Dictionary with PDF path or error information
         """
         try:
-            # Generate a unique filename
-            filename = f"Webhook_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.json"
-            filepath = os.path.join(self.json_storage_path, filename)
-            
-            # Save JSON to file
-            with open(filepath, 'w') as f:
-                json.dump(payload, f, indent=2)
-            
-            # Process the JSON immediately
-            json_content = json.dumps(payload)
-            processing_result = self.json_processing_service.process_json(json_content)
+            filename, write_future, processing_result = self._ingest(payload)
             
             # Extract PDF path from processing result
-            if processing_result.get('success') and 'data' in processing_result:
-                pdf_path = processing_result['data'].get('pdf_report_path')
-                if pdf_path and os.path.exists(pdf_path):
-                    return {
-                        'success': True,
-                        'message': 'Webhook processed and PDF generated successfully',
-                        'fileName': filename,
-                        'pdf_path': pdf_path
-                    }
+            pdf_path = self._generated_pdf_path(processing_result)
+            if pdf_path:
+                return {
+                    'success': True,
+                    'message': 'Webhook processed and PDF generated successfully',
+                    'fileName': filename,
+                    'pdf_path': pdf_path
+                }
             
-            # If we get here, something went wrong with PDF generation
+            # If we get here, something went wrong with PDF generation;
+            # surface a failed payload write as well
+            write_future.result()
             return {
                 'success': False,
                 'error': 'Failed to generate PDF from webhook data',
@@ -130,6 +203,9 @@ class WebhookController:
         """
         Process incoming webhook data, generate PDF, and send via email
         
+        Runs as a background job, so the email is sent here rather than
+        queued and the job result reflects whether it was delivered.
+        
         Args:
             payload: JSON payload from webhook
             to_email: Email address to send the PDF to (optional, will extract from payload if not provided)
@@ -138,17 +214,7 @@ class WebhookController:
             Dictionary with processing results and email status
         """
         try:
-            # Generate a unique filename
-            filename = f"Webhook_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.json"
-            filepath = os.path.join(self.json_storage_path, filename)
-            
-            # Save JSON to file
-            with open(filepath, 'w') as f:
-                json.dump(payload, f, indent=2)
-            
-            # Process the JSON immediately
-            json_content = json.dumps(payload)
-            processing_result = self.json_processing_service.process_json(json_content)
+            filename, write_future, processing_result = self._ingest(payload)
             
             # Extract PDF path and user name from processing result
             if processing_result.get('success') and 'data' in processing_result:
@@ -164,12 +230,12 @@ class WebhookController:
                     return {
                         'success': False,
                         'error': 'No email address provided or found in payload',
-                        'details': 'Please provide an email address or ensure the payload contains an email field with reference ID 39f116ed-5403-407a-b506-c9625e9e6b2a'
+                        'details': f'Please provide an email address or ensure the payload contains an email field with reference ID {EMAIL_REF}'
                     }, 400
                 
                 if pdf_path and os.path.exists(pdf_path):
                     # Send email with PDF attachment
-                    subject = f"Your Health Score Report - {datetime.utcnow().strftime('%Y-%m-%d')}"
+                    subject = f"Your Health Score Report - {utc_date()}"
                     body = f"Hello {user_name},\n\nThank you for using our Health Score service. Your health score report is attached.\n\nBest regards,\nThe Health Score Team"
                     
                     email_result = self.email_service.send_email_with_pdf(
@@ -188,7 +254,9 @@ class WebhookController:
                         'emailResult': email_result
                     }
             
-            # If we get here, something went wrong with PDF generation
+            # If we get here, something went wrong with PDF generation;
+            # surface a failed payload write as well
+            write_future.result()
             return {
                 'success': False,
                 'error': 'Failed to generate PDF from webhook data',
@@ -200,3 +268,59 @@ class WebhookController:
                 'error': 'Failed to process webhook and send email',
                 'details': str(e)
             }, 500
+    
+    def submit_webhook_and_email(self, payload, to_email=None):
+        """
+        Validate webhook data and queue its processing and emailing as a background job
+        
+        Args:
+            payload: JSON payload from webhook
+            to_email: Email address to send the PDF to (optional, will extract from payload if not provided)
+            
+        Returns:
+            Dictionary with the job ID, or error information
+        """
+        if not isinstance(payload, dict):
+            return {
+                'success': False,
+                'error': 'Invalid webhook payload',
+                'details': 'Expected a JSON object'
+            }, 400
+        
+        # Check the recipient up front so the caller learns about a missing email now
+        recipient_email = to_email or self._extract_email_from_payload(payload)
+        if not recipient_email:
+            return {
+                'success': False,
+                'error': 'No email address provided or found in payload',
+                'details': f'Please provide an email address or ensure the payload contains an email field with reference ID {EMAIL_REF}'
+            }, 400
+        
+        job_id = self.job_service.submit(self.process_webhook_and_email, payload, recipient_email)
+        return {
+            'success': True,
+            'message': 'Webhook accepted for processing',
+            'job_id': job_id,
+            'status': 'queued',
+            'statusUrl': f'/api/webhook-status/{job_id}'
+        }, 202
+    
+    def get_job_status(self, job_id):
+        """
+        Get the status of a queued webhook job
+        
+        Args:
+            job_id: ID returned when the webhook was accepted
+            
+        Returns:
+            Dictionary with the job status and result, or error information
+        """
+        job = self.job_service.get_status(job_id)
+        if job is None:
+            return {
+                'success': False,
+                'error': 'Job not found',
+                'details': f'No job with ID {job_id}'
+            }, 404
+        
+        return {'success': True, **job}
@@ -1,4 +1,5 @@
 from models.pillar_scores import PillarScores
 from models.processing_result import ProcessingResult
+from models.route_result import RouteResult
 
-__all__ = ['PillarScores', 'ProcessingResult']
+__all__ = ['PillarScores', 'ProcessingResult', 'RouteResult']
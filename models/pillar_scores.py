@@ -1,6 +1,15 @@
+from operator import attrgetter
+
+# Pillar fields in report order; also the keys produced by to_dict()
+_FIELDS = ('muscles_and_visceral_fat', 'cardio_vascular', 'sleep',
+           'cognitive', 'metabolic', 'emotional', 'overall')
+_get_fields = attrgetter(*_FIELDS)
+
 class PillarScores:
     """Class to store health score pillar values"""
     
+    __slots__ = _FIELDS
+    
     def __init__(self, muscles_and_visceral_fat=0, cardio_vascular=0, sleep=0, 
                  cognitive=0, metabolic=0, emotional=0, overall=0):
         self.muscles_and_visceral_fat = muscles_and_visceral_fat
@@ -13,12 +22,4 @@ class PillarScores:
     
     def to_dict(self):
         """Convert the pillar scores to a dictionary"""
-        return {
-            'muscles_and_visceral_fat': self.muscles_and_visceral_fat,
-            'cardio_vascular': self.cardio_vascular,
-            'sleep': self.sleep,
-            'cognitive': self.cognitive,
-            'metabolic': self.metabolic,
-            'emotional': self.emotional,
-            'overall': self.overall
-        }
+        return dict(zip(_FIELDS, _get_fields(self)))
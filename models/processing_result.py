@@ -1,6 +1,8 @@
 class ProcessingResult:
     """Class to store processing results"""
     
+    __slots__ = ('success', 'message', 'data')
+    
     def __init__(self, success=False, message="", data=None):
         self.success = success
         self.message = message
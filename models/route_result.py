@@ -0,0 +1,23 @@
+class RouteResult:
+    """Class describing the response a controller wants a route to send"""
+    
+    __slots__ = ('kind', 'payload', 'status', 'mimetype', 'as_attachment', 'path', 'stat')
+    
+    def __init__(self, kind, payload, status=200, mimetype=None, as_attachment=False, path=None, stat=None):
+        """
+        Args:
+            kind: 'file' to serve the open file in payload, 'json' to serialize payload
+            payload: Binary file object or JSON-serializable object
+            status: HTTP status code for JSON responses
+            mimetype: Content type of a served file
+            as_attachment: Whether a served file is sent as a download
+            path: Path of a served file
+            stat: os.stat_result of a served file, taken from the open handle
+        """
+        self.kind = kind
+        self.payload = payload
+        self.status = status
+        self.mimetype = mimetype
+        self.as_attachment = as_attachment
+        self.path = path
+        self.stat = stat
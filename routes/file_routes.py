@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, stream_with_context
 import os
 from controllers.file_controller import FileController
+from routes.responses import json_response
+from utils import fastjson
 
 # Create blueprint
 file_bp = Blueprint('file', __name__, url_prefix='/api')
@@ -8,50 +10,79 @@ file_bp = Blueprint('file', __name__, url_prefix='/api')
 # Store reference to controller
 file_controller = None
 email_service = None
+email_queue = None
+chart_service = None
+has_html_content = False
 
-def init_routes(storage_path, processing_service, email_svc=None):
+# Cache lifetime for stored JSON file responses
+FILE_MAX_AGE = 3600
+
+def init_routes(storage_path, processing_service, email_svc=None, email_q=None, chart_svc=None):
     """Initialize routes with required dependencies"""
-    global file_controller, email_service
+    global file_controller, email_service, email_queue, chart_service, has_html_content
     file_controller = FileController(storage_path, processing_service)
     email_service = email_svc
+    email_queue = email_q
+    chart_service = chart_svc
+    has_html_content = callable(getattr(email_svc, 'generate_html_content', None))
 
 @file_bp.route('/files', methods=['GET'])
 def get_files():
     """List all JSON files in storage directory"""
     try:
+        # Stream one JSON object per line for large directories
+        if request.args.get('format') == 'ndjson':
+            files = file_controller.iter_files()
+            return Response(
+                stream_with_context(fastjson.dumps(entry) + b'\n' for entry in files),
+                mimetype='application/x-ndjson'
+            )
+        
         # Delegate to controller
         result = file_controller.list_files()
         
         # Check if result includes status code
         if isinstance(result, tuple) and len(result) == 2:
-            return jsonify(result[0]), result[1]
+            return json_response(result[0], result[1])
         
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to list files',
             'details': str(e)
-        }), 500
+        }, 500)
 
 @file_bp.route('/files/<filename>', methods=['GET'])
 def get_file_content(filename):
     """Get content of a specific JSON file"""
     try:
+        # Stored payloads never change, so a matching ETag skips the read entirely
+        etag = file_controller.get_file_etag(filename)
+        if etag and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+        
         # Delegate to controller
         result = file_controller.get_file_content(filename)
         
         # Check if result includes status code
         if isinstance(result, tuple) and len(result) == 2:
-            return jsonify(result[0]), result[1]
+            return json_response(result[0], result[1])
         
-        return jsonify(result)
+        response = json_response(result)
+        if etag:
+            response.set_etag(etag, weak=True)
+            response.cache_control.public = True
+            response.cache_control.max_age = FILE_MAX_AGE
+        return response
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to read file',
             'details': str(e)
-        }), 500
+        }, 500)
 
 @file_bp.route('/files/<filename>/process', methods=['POST'])
 def process_file(filename):
@@ -66,96 +97,80 @@ def process_file(filename):
         
         # Check if result includes status code
         if isinstance(result, tuple) and len(result) == 2:
-            return jsonify(result[0]), result[1]
+            return json_response(result[0], result[1])
         
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to process file',
             'details': str(e)
-        }), 500
+        }, 500)
 
 @file_bp.route('/files/<filename>/email', methods=['POST'])
 def send_file_email(filename):
     """Send a processed file's PDF report via email"""
+    # Bind module-level dependencies once for the rest of the handler
+    fc = file_controller
+    es = email_service
+    eq = email_queue
+    cs = chart_service
+    
     try:
         # Check if email service is available
-        if not email_service:
-            return jsonify({
+        if not es or not eq:
+            return json_response({
                 'success': False,
                 'error': 'Email service not available',
                 'details': 'Email service is not configured in the application'
-            }), 500
+            }, 500)
             
-        # First, get the file content to process it
-        file_result = file_controller.get_file_content(filename)
+        # Read the file once, resolve the recipient and generate the PDF report
+        # (the query parameter is used if no email is found in the file)
+        process_result = fc.read_and_process(filename, fallback_email=request.args.get('email'))
         
-        # Check if file exists
-        if isinstance(file_result, tuple) or not file_result.get('success'):
-            return jsonify({
-                'success': False,
-                'error': 'File not found or could not be read',
-                'details': 'The specified file does not exist or could not be read'
-            }), 404
-            
-        # Extract email from the file content
-        to_email = None
-        if 'content' in file_result and isinstance(file_result['content'], dict):
-            # Try to extract email from form_response structure (Typeform format)
-            if 'form_response' in file_result['content'] and 'answers' in file_result['content']['form_response']:
-                for answer in file_result['content']['form_response']['answers']:
-                    if answer.get('type') == 'email' and 'field' in answer and answer['field'].get('ref') == '39f116ed-5403-407a-b506-c9625e9e6b2a':
-                        to_email = answer.get('email')
-                        break
-        
-        # Fallback to query parameter if email not found in file
-        if not to_email:
-            to_email = request.args.get('email')
-            
-        # Return error if no email found
-        if not to_email:
-            return jsonify({
-                'success': False,
-                'error': 'No email address found',
-                'details': 'Could not extract email from file and no email provided as query parameter'
-            }), 400
-            
-        # Process the file to get the PDF report
-        process_result = file_controller.process_file(filename)
+        # Return file/email errors as-is
+        if isinstance(process_result, tuple):
+            return json_response(process_result[0], process_result[1])
         
         # Check if processing was successful
         if not process_result.get('success') or 'pdfPath' not in process_result:
-            return jsonify({
+            return json_response({
                 'success': False,
                 'error': 'Failed to process file',
                 'details': 'Could not generate PDF report from the file'
-            }), 500
+            }, 500)
+        
+        to_email = process_result['toEmail']
+        content = process_result['content']
             
         # Get PDF path
         pdf_path = process_result.get('pdfPath')
         if not os.path.exists(pdf_path):
-            return jsonify({
+            return json_response({
                 'success': False,
                 'error': 'PDF file not found',
                 'details': f'Generated PDF file not found at path: {pdf_path}'
-            }), 500
+            }, 500)
             
         # Extract user name if available
         user_name = "User"
-        if 'content' in file_result and isinstance(file_result['content'], dict):
+        if isinstance(content, dict):
             # Try to extract user name from various possible JSON structures
-            if 'user' in file_result['content'] and 'name' in file_result['content']['user']:
-                user_name = file_result['content']['user']['name']
-            elif 'form_response' in file_result['content'] and 'definition' in file_result['content']['form_response']:
+            user = content.get('user')
+            form_response = content.get('form_response')
+            if user and 'name' in user:
+                user_name = user['name']
+            elif form_response and 'definition' in form_response:
                 user_name = f"User {filename}"
         
         # Get pillar scores and chart path from the process result
         pillar_scores = None
         chart_path = None
-        if 'data' in process_result:
-            pillar_scores = process_result['data'].get('pillar_scores')
-            chart_path = process_result['data'].get('chart_path')
+        data = process_result.get('data')
+        if data is not None:
+            pillar_scores = data.get('pillar_scores')
+            chart_path = data.get('chart_path')
             
             # Convert pillar_scores to dictionary if it's not already
             if pillar_scores and hasattr(pillar_scores, 'to_dict'):
@@ -167,18 +182,19 @@ def send_file_email(filename):
         
         # Generate HTML content if we have the pillar scores and chart
         html_content = None
-        if pillar_scores and chart_path and hasattr(email_service, 'generate_html_content'):
+        if pillar_scores and chart_path and has_html_content:
             try:
-                html_content = email_service.generate_html_content(
+                html_content = es.generate_html_content(
                     user_name=user_name,
                     pillar_scores=pillar_scores,
-                    chart_path=chart_path
+                    chart_path=chart_path,
+                    chart_b64=cs.chart_base64(chart_path) if cs else None
                 )
             except Exception as e:
                 print(f"Error generating HTML content: {e}")
         
-        # Send email with PDF attachment and HTML content
-        email_result = email_service.send_email_with_pdf(
+        # Queue email with PDF attachment and HTML content for background delivery
+        email_result = eq.put(
             to_email=to_email,
             subject=subject,
             body=body,
@@ -188,16 +204,16 @@ def send_file_email(filename):
             pillar_scores=pillar_scores
         )
         
-        return jsonify({
-            'success': email_result.get('success', False),
-            'message': 'Email sent successfully' if email_result.get('success', False) else 'Failed to send email',
+        return json_response({
+            'success': True,
+            'message': 'Email queued',
             'filename': filename,
             'emailResult': email_result,
             'to_email': to_email  # Return the email address that was used
-        })
+        }, 202)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to send email',
             'details': str(e)
-        }), 500
+        }, 500)
@@ -1,17 +1,29 @@
 import os
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request
+from werkzeug.exceptions import HTTPException
 from controllers.report_controller import ReportController
+from routes.responses import file_response, json_response
 
 # Create blueprint
 report_bp = Blueprint('report', __name__, url_prefix='/api')
 
 # Store reference to controller
 report_controller = None
+storage_path = None
 
 def init_routes(pdf_storage_path):
     """Initialize routes with required dependencies"""
-    global report_controller
+    global report_controller, storage_path
     report_controller = ReportController(pdf_storage_path)
+    storage_path = os.path.abspath(pdf_storage_path)
+
+# Response builders for each RouteResult kind; served files arrive already
+# opened by the controller
+_RESPONDERS = {
+    'file': lambda result: file_response(result.path, result.mimetype, as_attachment=result.as_attachment,
+                                         accel_root=storage_path, file=result.payload, stat=result.stat),
+    'json': lambda result: json_response(result.payload, result.status)
+}
 
 @report_bp.route('/download-pdf', methods=['GET'])
 def download_pdf():
@@ -22,23 +34,17 @@ def download_pdf():
         # Delegate to controller
         result = report_controller.download_pdf(path)
         
-        # Check if result includes status code
-        if isinstance(result, tuple) and len(result) == 2:
-            return jsonify(result[0]), result[1]
-        
-        # If result is a path string, serve the file
-        if isinstance(result, str) and os.path.exists(result):
-            return send_file(result, mimetype='application/pdf', as_attachment=True, 
-                           download_name=os.path.basename(result))
-            
-        # Otherwise return as JSON
-        return jsonify(result)
+        # Serve the file or JSON the controller decided on
+        return _RESPONDERS[result.kind](result)
+    except HTTPException:
+        # Protocol errors such as 416 for an unsatisfiable Range keep their status
+        raise
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to download PDF',
             'details': str(e)
-        }), 500
+        }, 500)
 
 @report_bp.route('/view-chart', methods=['GET'])
 def view_chart():
@@ -49,19 +55,14 @@ def view_chart():
         # Delegate to controller
         result = report_controller.view_chart(path)
         
-        # Check if result is a tuple (error with status code)
-        if isinstance(result, tuple) and len(result) == 2:
-            return jsonify(result[0]), result[1]
-        
-        # If result is a path string, serve the file
-        if isinstance(result, str) and os.path.exists(result):
-            return send_file(result, mimetype='image/png')
-            
-        # Otherwise return as JSON
-        return jsonify(result)
+        # Serve the file or JSON the controller decided on
+        return _RESPONDERS[result.kind](result)
+    except HTTPException:
+        # Protocol errors such as 416 for an unsatisfiable Range keep their status
+        raise
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to view chart',
             'details': str(e)
-        }), 500
+        }, 500)
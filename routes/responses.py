@@ -0,0 +1,98 @@
+import os
+from zlib import adler32
+from flask import Response, current_app, request, send_file
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from utils import fastjson
+
+# Generated files never change once written, so clients may cache them
+FILE_MAX_AGE = 3600
+
+# When running behind nginx, set this to an `internal` location that maps to
+# PdfData (e.g. /internal-pdf/) so nginx streams the files instead of Python
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by utils.fastjson
+    
+    Makes request.json, request.get_json() and jsonify use orjson when it is
+    installed. Objects with a to_dict method, such as PillarScores, are
+    serialized through it; anything else falls back to Flask's defaults.
+    """
+    
+    def _default(self, obj):
+        if hasattr(obj, 'to_dict'):
+            return obj.to_dict()
+        return DefaultJSONProvider.default(obj)
+    
+    def dumps(self, obj, **kwargs):
+        return fastjson.dumps(obj, default=self._default).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return fastjson.loads(s)
+
+def json_response(obj, status=200):
+    """
+    Build a JSON response, serializing the body with orjson when available
+    
+    Args:
+        obj: JSON-serializable object for the response body
+        status: HTTP status code
+        
+    Returns:
+        Flask response object
+    """
+    return current_app.response_class(fastjson.dumps(obj), status=status, mimetype='application/json')
+
+def file_response(path, mimetype, as_attachment=False, accel_root=None, file=None, stat=None):
+    """
+    Serve a generated file, offloading to nginx when configured
+    
+    Args:
+        path: Path to the file
+        mimetype: Content type of the file
+        as_attachment: Whether to send the file as a download
+        accel_root: Directory that X_ACCEL_REDIRECT_PREFIX maps to; files
+            outside it are always sent by Flask
+        file: Already opened binary file to send instead of opening path
+        stat: os.stat_result of file, required when file is given
+        
+    Returns:
+        Flask response object
+    """
+    path = os.path.abspath(path)
+    
+    # Let nginx send files that live under the mapped directory
+    if X_ACCEL_REDIRECT_PREFIX and accel_root and os.path.commonpath([accel_root, path]) == accel_root:
+        if file is not None:
+            file.close()
+        relative_path = os.path.relpath(path, accel_root).replace(os.sep, '/')
+        response = Response(status=200, mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative_path
+        if as_attachment:
+            response.headers.set('Content-Disposition', 'attachment', filename=os.path.basename(path))
+        return response
+    
+    # Conditional responses let repeat clients get a 304 or a byte range, and
+    # passing the path lets the WSGI server use sendfile(2)
+    if file is None:
+        return send_file(path, mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=os.path.basename(path) if as_attachment else None,
+                         conditional=True, etag=True, max_age=FILE_MAX_AGE)
+    
+    # An open file carries no size or mtime for send_file to use, so supply
+    # them from its stat; the ETag matches the one send_file derives for paths.
+    # send_file cannot know the size here, so the conditional handling is
+    # done once below instead of inside send_file
+    check = adler32(path.encode()) & 0xFFFFFFFF
+    response = send_file(file, mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=os.path.basename(path), conditional=False,
+                         etag=f'{stat.st_mtime}-{stat.st_size}-{check}',
+                         last_modified=stat.st_mtime, max_age=FILE_MAX_AGE)
+    response.content_length = stat.st_size
+    try:
+        return response.make_conditional(request.environ, accept_ranges=True, complete_length=stat.st_size)
+    except RequestedRangeNotSatisfiable:
+        file.close()
+        raise
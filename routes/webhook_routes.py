@@ -1,22 +1,29 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request
 import os
 from controllers.webhook_controller import WebhookController
+from routes.responses import file_response, json_response
 
 # Create blueprint
 webhook_bp = Blueprint('webhook', __name__, url_prefix='/api')
 
 # Store reference to controller
 webhook_controller = None
+pdf_storage_path = None
 
-def init_routes(storage_path, processing_service, email_service):
+def init_routes(storage_path, processing_service, email_service, job_service, pdf_path=None):
     """Initialize routes with required dependencies"""
-    global webhook_controller
-    webhook_controller = WebhookController(storage_path, processing_service, email_service)
+    global webhook_controller, pdf_storage_path
+    webhook_controller = WebhookController(storage_path, processing_service, email_service, job_service)
+    pdf_storage_path = os.path.abspath(pdf_path) if pdf_path else None
 
 @webhook_bp.route('/webhook', methods=['POST'])
 def receive_webhook():
     """Receive webhook data, save to file, and process"""
     try:
+        # Clients that send several payloads as NDJSON get a batch result
+        if request.mimetype == 'application/x-ndjson':
+            return _batch_response(webhook_controller.process_webhook_batch(request.get_data(cache=False)))
+        
         # Get JSON payload
         payload = request.json
         
@@ -25,15 +32,34 @@ def receive_webhook():
         
         # Check if result includes status code
         if isinstance(result, tuple) and len(result) == 2:
-            return jsonify(result[0]), result[1]
+            return json_response(result[0], result[1])
         
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to process webhook',
             'details': str(e)
-        }), 500
+        }, 500)
+
+@webhook_bp.route('/webhook-batch', methods=['POST'])
+def receive_webhook_batch():
+    """Receive newline-delimited webhook payloads, saving and processing each"""
+    try:
+        return _batch_response(webhook_controller.process_webhook_batch(request.get_data(cache=False)))
+    except Exception as e:
+        return json_response({
+            'success': False,
+            'error': 'Failed to process webhook batch',
+            'details': str(e)
+        }, 500)
+
+def _batch_response(result):
+    """Convert a batch result, with or without status code, to a response"""
+    if isinstance(result, tuple) and len(result) == 2:
+        return json_response(result[0], result[1])
+    
+    return json_response(result)
 
 @webhook_bp.route('/webhook-to-pdf', methods=['POST'])
 def receive_webhook_and_generate_pdf():
@@ -47,25 +73,25 @@ def receive_webhook_and_generate_pdf():
         
         # Check if result is a tuple (error with status code)
         if isinstance(result, tuple) and len(result) == 2:
-            return jsonify(result[0]), result[1]
+            return json_response(result[0], result[1])
         
         # If result contains a PDF path, serve the file
         if isinstance(result, dict) and 'pdf_path' in result and os.path.exists(result['pdf_path']):
-            return send_file(result['pdf_path'], mimetype='application/pdf', as_attachment=True,
-                           download_name=os.path.basename(result['pdf_path']))
+            return file_response(result['pdf_path'], 'application/pdf', as_attachment=True,
+                                 accel_root=pdf_storage_path)
         
         # Otherwise return as JSON
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to process webhook and generate PDF',
             'details': str(e)
-        }), 500
+        }, 500)
 
 @webhook_bp.route('/webhook-to-email', methods=['POST'])
 def receive_webhook_and_send_email():
-    """Receive webhook data, save to file, process, and send PDF via email"""
+    """Receive webhook data and queue saving, processing and emailing the PDF"""
     try:
         # Get JSON payload
         payload = request.json
@@ -73,18 +99,35 @@ def receive_webhook_and_send_email():
         # Get email parameters from request (optional now)
         to_email = request.args.get('email')
             
-        # Delegate to controller for processing with email sending
+        # Delegate to controller, which queues processing and email sending
         # The controller will extract email from payload if not provided
-        result = webhook_controller.process_webhook_and_email(payload, to_email)
+        result = webhook_controller.submit_webhook_and_email(payload, to_email)
         
         # Return result as JSON
         if isinstance(result, tuple) and len(result) == 2:
-            return jsonify(result[0]), result[1]
+            return json_response(result[0], result[1])
             
-        return jsonify(result)
+        return json_response(result)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Failed to process webhook and send email',
             'details': str(e)
-        }), 500
+        }, 500)
+
+@webhook_bp.route('/webhook-status/<job_id>', methods=['GET'])
+def get_webhook_status(job_id):
+    """Get the status of a webhook queued by /webhook-to-email"""
+    try:
+        result = webhook_controller.get_job_status(job_id)
+        
+        if isinstance(result, tuple) and len(result) == 2:
+            return json_response(result[0], result[1])
+        
+        return json_response(result)
+    except Exception as e:
+        return json_response({
+            'success': False,
+            'error': 'Failed to get webhook status',
+            'details': str(e)
+        }, 500)
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+import time
+from utils.files import write_atomic
+
+# Files used more recently than this are never evicted. A path handed out
+# stays valid for at least this long: the pdfUrl and chartUrl in a response,
+# a report reused for a repeat request within REPORT_REUSE_SECONDS, and the
+# PDF a queued email attaches once it is sent
+EVICT_MIN_AGE_SECONDS = 900
+
+class DiskLRU:
+    """Size-bounded store for generated files, evicting the least recently used"""
+
+    def __init__(self, root, max_bytes, min_age=EVICT_MIN_AGE_SECONDS):
+        """
+        Initialize the store and its index
+
+        The index is a SQLite database in WAL mode inside root, so every worker
+        process sharing the directory sees the same entries and usage.
+
+        Args:
+            root: Directory that holds the stored files
+            max_bytes: Total size the stored files may use before eviction
+            min_age: Seconds since last use before a file may be evicted; the
+                store may exceed max_bytes while every file is younger
+        """
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.root, '.artifacts.sqlite3'),
+                                     timeout=10, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS artifacts ('
+                               'name TEXT PRIMARY KEY, size INTEGER NOT NULL, atime REAL NOT NULL)')
+
+    def get(self, name):
+        """
+        Look up a stored file and mark it as recently used
+
+        Args:
+            name: File name relative to root
+
+        Returns:
+            Path to the file, or None if it is not stored
+        """
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            return None
+
+        with self._lock, self._conn:
+            updated = self._conn.execute('UPDATE artifacts SET atime = ? WHERE name = ?',
+                                         (time.time(), name)).rowcount
+        return path if updated else None
+
+    def put(self, name, data):
+        """
+        Store a file, evicting older files if the store is over its size limit
+
+        Args:
+            name: File name relative to root
+            data: File contents as bytes
+
+        Returns:
+            Path to the stored file
+        """
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data)
+
+        self._record(name, len(data))
+        return path
+
+    def _record(self, name, size):
+        """Index a stored file as most recently used and enforce the size limit"""
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO artifacts (name, size, atime) VALUES (?, ?, ?)',
+                               (name, size, time.time()))
+            self._evict(keep=name)
+
+    def _evict(self, keep):
+        """Delete least recently used files past min_age until the store fits in max_bytes"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM artifacts').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        oldest = self._conn.execute('SELECT name, size FROM artifacts WHERE name != ? AND atime < ? '
+                                    'ORDER BY atime', (keep, time.time() - self.min_age)).fetchall()
+        for name, size in oldest:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error evicting cached file {name}: {e}")
+                continue
+            self._conn.execute('DELETE FROM artifacts WHERE name = ?', (name,))
+            total -= size
@@ -1,73 +1,92 @@
 import os
-import uuid
+import io
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
-import matplotlib.pyplot as plt
-from datetime import datetime
-from matplotlib.path import Path
-from matplotlib.spines import Spine
-from matplotlib.transforms import Affine2D
+from utils.naming import unique_filename
+
+# Keep matplotlib's font cache in a persistent, writable directory so it is
+# built once rather than in a temporary directory on every process start.
+# The Docker image sets MPLCONFIGDIR and builds the cache at image build time.
+os.environ.setdefault('MPLCONFIGDIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache', 'matplotlib'))
+os.makedirs(os.environ['MPLCONFIGDIR'], exist_ok=True)
+
+# Category labels in the same order as the plotted values
+CATEGORIES = ['Muscles & Visceral Fat', 'Cardiovascular', 'Sleep', 
+              'Cognitive', 'Metabolic', 'Emotional']
+
+# Value label (ha, va, offset_x, offset_y) per category, pushing each label
+# outward from its spoke: right, top-right, top-left, left, bottom-left, bottom-right
+LABEL_PLACEMENT = [
+    ('left', 'center', 0.05, 0),
+    ('left', 'bottom', 0.05, 0.05),
+    ('right', 'bottom', -0.05, 0.05),
+    ('right', 'center', -0.05, 0),
+    ('right', 'top', -0.05, -0.05),
+    ('left', 'top', 0.05, -0.05),
+]
+
+# Resolution of saved charts; 150 dpi stays sharp at the 500px email width
+CHART_DPI = 150
+
+# Number of rendered charts remembered by score
+CHART_CACHE_SIZE = 128
 
 class ChartGenerationService:
     """Service for generating health score radar charts"""
     
-    def __init__(self):
-        # Create charts directory if it doesn't exist
-        self.charts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'PdfData', 'charts')
-        os.makedirs(self.charts_dir, exist_ok=True)
-        
-        # Set matplotlib to use a non-interactive backend
-        plt.switch_backend('Agg')
-    
-    def generate_chart(self, pillar_scores):
+    def __init__(self, artifact_cache=None):
         """
-        Generate a radar chart visualization of health scores
+        Initialize the chart service
         
         Args:
-            pillar_scores: PillarScores object with health scores
-            
-        Returns:
-            Path to the generated chart image file
+            artifact_cache: Optional DiskLRU holding the charts directory; when
+                given, charts are named by score and stored with bounded disk use
         """
-        # Extract scores from the pillar_scores object
-        categories = ['Muscles & Visceral Fat', 'Cardiovascular', 'Sleep', 
-                      'Cognitive', 'Metabolic', 'Emotional']
+        # Create charts directory if it doesn't exist
+        self.charts_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'PdfData', 'charts')
+        os.makedirs(self.charts_dir, exist_ok=True)
+        self.artifact_cache = artifact_cache
         
-        values = [
-            pillar_scores.muscles_and_visceral_fat,
-            pillar_scores.cardio_vascular,
-            pillar_scores.sleep,
-            pillar_scores.cognitive,
-            pillar_scores.metabolic,
-            pillar_scores.emotional
-        ]
+        # The chart scaffold is built on first use and shared between requests,
+        # so renders from concurrent request threads must not interleave
+        self._lock = threading.Lock()
+        self._fig = None
         
-        # Normalize values to 0-1 for plotting (extend to 0-120 scale)
-        values = [v / 120 for v in values]
+        # Score tuple -> chart path, and chart path -> base64 PNG, most recent last
+        self._charts = OrderedDict()
+        self._chart_base64 = {}
+    
+    def _build_scaffold(self):
+        """Create the figure with every artist that does not depend on the scores"""
+        # Imported here so processes that never draw a chart skip loading matplotlib
+        from matplotlib.figure import Figure
         
         # Number of variables
-        N = len(categories)
+        N = len(CATEGORIES)
         
         # Create angles for each category (divide the circle into equal parts)
         angles = [n / float(N) * 2 * np.pi for n in range(N)]
         angles += angles[:1]  # Close the loop
+        self._angles = angles
         
-        # Add the values for the chart (and close the loop)
-        values += values[:1]
-        
-        # Create the plot
-        fig, ax = plt.subplots(figsize=(10, 10), subplot_kw=dict(polar=True))
+        # Create the plot outside pyplot so no global figure state is involved
+        fig = Figure(figsize=(10, 10))
+        ax = fig.add_subplot(polar=True)
         
         # Remove the circular grid lines and frame
         ax.grid(False)
         ax.spines['polar'].set_visible(False)
         
         # Draw one axis per variable and add labels
-        plt.xticks(angles[:-1], categories, size=14)
+        ax.set_xticks(angles[:-1], CATEGORIES, size=14)
         
         # Draw the y-axis labels (0-120)
-        plt.yticks([0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0], 
-                  ['12', '24', '36', '48', '60', '72', '84', '96', '108', '120'], 
-                  color='grey', size=12)
+        ax.set_yticks([0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0], 
+                      ['12', '24', '36', '48', '60', '72', '84', '96', '108', '120'], 
+                      color='grey', size=12)
         
         # Add radial grid lines from center to each category point
         for angle in angles[:-1]:
@@ -83,88 +102,181 @@ class ChartGenerationService:
             ax.plot(angles, grid_values, color='grey', 
                    linestyle='--', linewidth=0.5, alpha=0.5)
         
-        # Plot data
-        ax.plot(angles, values, linewidth=2, linestyle='solid', color='#1aaf6c')
+        # Data line, fill area and square markers; their data is set per chart
+        self._line, = ax.plot(angles, [0] * len(angles), linewidth=2, linestyle='solid', color='#1aaf6c')
+        self._fill, = ax.fill(angles, [0] * len(angles), alpha=0.25, color='#1aaf6c')
+        self._markers, = ax.plot(angles[:-1], [0] * N, linestyle='none', marker='s', markersize=8,
+                                 color='#1aaf6c', markeredgecolor='white', markeredgewidth=1, zorder=10)
         
-        # Fill area
-        ax.fill(angles, values, alpha=0.25, color='#1aaf6c')
+        # Value labels at each point where the polygon touches the axes;
+        # alignment depends only on the angle, the position on the score
+        self._labels = []
+        for angle, (ha, va, offset_x, offset_y) in zip(angles, LABEL_PLACEMENT):
+            label = ax.annotate('', 
+                               (angle, 0),
+                               xytext=(angle + offset_x, offset_y),
+                               textcoords='data',
+                               ha=ha, va=va,
+                               fontsize=12,
+                               fontweight='bold',
+                               bbox=dict(boxstyle='square,pad=0.3', fc='white', alpha=0.7))
+            self._labels.append((label, offset_x, offset_y))
+        
+        # Add a title
+        ax.set_title('Your Health Score', size=20, y=1.1)
+        
+        # Adjust the layout
+        fig.tight_layout()
+        
+        self._fig = fig
+    
+    def generate_chart(self, pillar_scores):
+        """
+        Generate a radar chart visualization of health scores
+        
+        Args:
+            pillar_scores: PillarScores object with health scores
+            
+        Returns:
+            Path to the generated chart image file
+        """
+        scores = self._score_values(pillar_scores)
         
-        # Add dots and value labels at each point where polygon touches axes
-        for i in range(len(categories)):
-            # Get the x,y coordinates
-            angle = angles[i]
-            value = values[i]
+        with self._lock:
+            # Identical scores produce an identical chart, so reuse it while the
+            # file exists; a stored chart is also marked as recently used so
+            # that charts in demand are evicted last
+            filepath = self._charts.get(scores)
+            if filepath:
+                if self.artifact_cache is None:
+                    filepath = filepath if os.path.exists(filepath) else None
+                else:
+                    filepath = self.artifact_cache.get(os.path.relpath(filepath, self.artifact_cache.root))
+                if filepath:
+                    self._charts.move_to_end(scores)
+                    return filepath
             
-            # Convert to cartesian coordinates for annotation placement
-            x = value * np.cos(angle)
-            y = value * np.sin(angle)
+            if self.artifact_cache is None:
+                png = self._render_chart(scores)
+                
+                # Generate a unique filename
+                filename = unique_filename('chart', 'png')
+                filepath = os.path.join(self.charts_dir, filename)
+                
+                # Save the figure
+                with open(filepath, 'wb') as f:
+                    f.write(png)
+            else:
+                # Charts are named by their scores, so a chart stored by any
+                # worker process is reused instead of rendered again
+                name = os.path.relpath(os.path.join(self.charts_dir, self._cache_name(scores)),
+                                       self.artifact_cache.root)
+                filepath = self.artifact_cache.get(name)
+                if filepath:
+                    with open(filepath, 'rb') as f:
+                        png = f.read()
+                else:
+                    png = self._render_chart(scores)
+                    filepath = self.artifact_cache.put(name, png)
             
-            # Add a small square marker at the point instead of a circle
-            ax.plot(angle, value, marker='s', markersize=8, color='#1aaf6c', markeredgecolor='white', markeredgewidth=1, zorder=10)
+            self._remember_chart(scores, filepath, png)
+            return filepath
+    
+    def generate_chart_bytes(self, pillar_scores):
+        """
+        Generate a radar chart in memory, without writing it to disk
+        
+        Args:
+            pillar_scores: PillarScores object with health scores
             
-            # Add the value label
-            # Adjust the position slightly based on the angle to avoid overlap
-            ha = 'center'
-            va = 'center'
-            offset_x = 0
-            offset_y = 0
+        Returns:
+            Tuple of (PNG image bytes, base64-encoded PNG string)
+        """
+        scores = self._score_values(pillar_scores)
+        
+        with self._lock:
+            # Reuse a chart recently generated for the same scores
+            chart_b64 = self._chart_base64.get(self._charts.get(scores))
+            if chart_b64:
+                self._charts.move_to_end(scores)
+                return base64.b64decode(chart_b64), chart_b64
             
-            # Adjust position based on angle
-            if angle == 0:  # Right
-                ha = 'left'
-                offset_x = 0.05
-            elif angle == np.pi/2:  # Top
-                va = 'bottom'
-                offset_y = 0.05
-            elif angle == np.pi:  # Left
-                ha = 'right'
-                offset_x = -0.05
-            elif angle == 3*np.pi/2:  # Bottom
-                va = 'top'
-                offset_y = -0.05
-            elif 0 < angle < np.pi/2:  # Top-right quadrant
-                ha = 'left'
-                va = 'bottom'
-                offset_x = 0.05
-                offset_y = 0.05
-            elif np.pi/2 < angle < np.pi:  # Top-left quadrant
-                ha = 'right'
-                va = 'bottom'
-                offset_x = -0.05
-                offset_y = 0.05
-            elif np.pi < angle < 3*np.pi/2:  # Bottom-left quadrant
-                ha = 'right'
-                va = 'top'
-                offset_x = -0.05
-                offset_y = -0.05
-            else:  # Bottom-right quadrant
-                ha = 'left'
-                va = 'top'
-                offset_x = 0.05
-                offset_y = -0.05
+            png = self._render_chart(scores)
+        
+        return png, base64.b64encode(png).decode()
+    
+    def chart_base64(self, chart_path):
+        """
+        Get the base64-encoded PNG of a recently generated chart
+        
+        Args:
+            chart_path: Path returned by generate_chart
             
-            # Add the value label (convert back to 0-120 scale)
-            ax.annotate(f'{int(value * 120)}', 
-                       (angle, value),
-                       xytext=(angle + offset_x, value + offset_y),
-                       textcoords='data',
-                       ha=ha, va=va,
-                       fontsize=12,
-                       fontweight='bold',
-                       bbox=dict(boxstyle='square,pad=0.3', fc='white', alpha=0.7))
+        Returns:
+            Base64 string, or None if the chart is not cached
+        """
+        return self._chart_base64.get(chart_path)
+    
+    def _score_values(self, pillar_scores):
+        """Extract the six plotted scores from the pillar_scores object, in category order"""
+        return (
+            pillar_scores.muscles_and_visceral_fat,
+            pillar_scores.cardio_vascular,
+            pillar_scores.sleep,
+            pillar_scores.cognitive,
+            pillar_scores.metabolic,
+            pillar_scores.emotional
+        )
+    
+    def _cache_name(self, scores):
+        """Build the stored chart filename from a hash of the scores and output settings"""
+        key = repr((scores, CHART_DPI)).encode()
+        return f"chart_{hashlib.blake2b(key, digest_size=16).hexdigest()}.png"
+    
+    def _remember_chart(self, scores, filepath, png):
+        """Cache a rendered chart, evicting the least recently used one"""
+        stale = self._charts.pop(scores, None)
+        if stale:
+            self._chart_base64.pop(stale, None)
         
-        # Add a title
-        plt.title('Your Health Score', size=20, y=1.1)
+        self._charts[scores] = filepath
+        self._chart_base64[filepath] = base64.b64encode(png).decode()
         
-        # Adjust the layout
-        plt.tight_layout()
+        if len(self._charts) > CHART_CACHE_SIZE:
+            _, evicted = self._charts.popitem(last=False)
+            self._chart_base64.pop(evicted, None)
+    
+    def _render_chart(self, values):
+        """
+        Update the scaffold with the scores and render it
+        
+        Args:
+            values: The six pillar scores in category order
+            
+        Returns:
+            PNG image as bytes
+        """
+        if self._fig is None:
+            self._build_scaffold()
+        
+        # Normalize values to 0-1 for plotting (extend to 0-120 scale)
+        values = [v / 120 for v in values]
+        
+        # Add the values for the chart (and close the loop)
+        values += values[:1]
         
-        # Generate a unique filename
-        filename = f"chart_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.png"
-        filepath = os.path.join(self.charts_dir, filename)
+        # Plot data and fill area
+        angles = self._angles
+        self._line.set_ydata(values)
+        self._fill.set_xy(np.column_stack((angles, values)))
+        self._markers.set_ydata(values[:-1])
         
-        # Save the figure
-        plt.savefig(filepath, dpi=300, bbox_inches='tight')
-        plt.close(fig)  # Close the figure to free memory
+        # Move the value labels (convert back to 0-120 scale)
+        for (label, offset_x, offset_y), angle, value in zip(self._labels, angles, values):
+            label.set_text(f'{int(value * 120)}')
+            label.xy = (angle, value)
+            label.set_position((angle + offset_x, value + offset_y))
         
-        return filepath
+        buffer = io.BytesIO()
+        self._fig.savefig(buffer, format='png', dpi=CHART_DPI, bbox_inches='tight')
+        return buffer.getvalue()
@@ -0,0 +1,71 @@
+import queue
+import threading
+
+# Number of emails sent to SendGrid at the same time
+EMAIL_WORKERS = 4
+
+class EmailQueue:
+    """In-process queue that sends emails from background worker threads"""
+
+    def __init__(self, email_service, workers=EMAIL_WORKERS):
+        """
+        Initialize the queue and start its worker threads
+
+        Args:
+            email_service: EmailService used to deliver queued emails
+            workers: Number of worker threads; each holds one SendGrid request at a time
+        """
+        self.email_service = email_service
+        self._queue = queue.Queue()
+        self._workers = [
+            threading.Thread(target=self._run, name=f'email-queue-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def put(self, to_email, subject, body, pdf_path, html_content=None, chart_path=None, pillar_scores=None):
+        """
+        Queue an email with a PDF attachment for background delivery
+
+        Args:
+            to_email: Recipient email address
+            subject: Email subject
+            body: Email body text (plain text version)
+            pdf_path: Path to the PDF file to attach
+            html_content: Optional HTML content for the email body
+            chart_path: Optional path to chart image to embed in email
+            pillar_scores: Optional pillar scores object to include in email
+
+        Returns:
+            Dictionary describing the queued email
+        """
+        self._queue.put({
+            'to_email': to_email,
+            'subject': subject,
+            'body': body,
+            'pdf_path': pdf_path,
+            'html_content': html_content,
+            'chart_path': chart_path,
+            'pillar_scores': pillar_scores
+        })
+        return {
+            'success': True,
+            'queued': True,
+            'message': 'Email queued',
+            'to_email': to_email,
+            'subject': subject
+        }
+
+    def _run(self):
+        """Deliver queued emails one at a time per worker, reporting failures"""
+        while True:
+            email = self._queue.get()
+            try:
+                result = self.email_service.send_email_with_pdf(**email)
+                if not result.get('success', False):
+                    print(f"Error sending queued email to {email['to_email']}: {result.get('error')} {result.get('details', '')}")
+            except Exception as e:
+                print(f"Error sending queued email to {email['to_email']}: {e}")
+            finally:
+                self._queue.task_done()
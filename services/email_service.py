@@ -1,9 +1,66 @@
 import os
 import base64
+import mmap
 from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition, Content, MimeType
 
+# Pillar score attributes shown in the email, in report order
+_SCORE_ATTRS = ('muscles_and_visceral_fat', 'cardio_vascular', 'sleep',
+                'cognitive', 'metabolic', 'emotional', 'overall')
+_score_get = attrgetter(*_SCORE_ATTRS)
+
+# Create extremely minimal HTML content to avoid email client clipping
+_HTML_TEMPLATE = """
+        <h2>Your Health Score Report</h2>
+        <p>User: {user_name}</p>
+        <p>Date: {date}</p>
+        
+        <div>
+            {chart_img_tag}
+        </div>
+        
+        <h3>Health Scores</h3>
+        
+        <p>Muscles and Visceral Fat: <strong>{muscles_and_visceral_fat}</strong></p>
+        <p>Cardiovascular Health: <strong>{cardio_vascular}</strong></p>
+        <p>Sleep: <strong>{sleep}</strong></p>
+        <p>Cognitive Health: <strong>{cognitive}</strong></p>
+        <p>Metabolic Health: <strong>{metabolic}</strong></p>
+        <p>Emotional Well-being: <strong>{emotional}</strong></p>
+        <p>Overall Score: <strong>{overall}</strong></p>
+        
+        <p>This report was generated automatically. Please do not reply to this email.</p>
+        """
+
+# Stands in for the send time in cached HTML; filled in on every call
+_DATE_PLACEHOLDER = '\x00date\x00'
+
+@lru_cache(maxsize=32)
+def _build_html(user_name, scores, chart_img_tag):
+    """
+    Fill the email template for a user, scores and chart
+    
+    Cached so repeat sends of the same report skip rebuilding the HTML. The
+    cache is kept small since each entry holds the base64 chart.
+    
+    Args:
+        user_name: Name of the user for the report
+        scores: Tuple of (attribute, score) pairs
+        chart_img_tag: HTML image tag embedding the chart, or ''
+        
+    Returns:
+        HTML content with _DATE_PLACEHOLDER in place of the date
+    """
+    return _HTML_TEMPLATE.format_map({
+        **dict(scores),
+        'user_name': user_name,
+        'date': _DATE_PLACEHOLDER,
+        'chart_img_tag': chart_img_tag
+    })
+
 class EmailService:
     """Service for sending emails with PDF attachments and HTML content"""
     
@@ -18,8 +75,12 @@ class EmailService:
 
         if not self.api_key:
             print("Warning: SENDGRID_API_KEY not set. Email functionality will not work.")
+        
+        # One client for all sends; it only holds the key and default headers,
+        # and each send builds its own request, so it is safe to share between threads
+        self._client = SendGridAPIClient(self.api_key) if self.api_key else None
             
-    def generate_html_content(self, user_name, pillar_scores, chart_path=None):
+    def generate_html_content(self, user_name, pillar_scores, chart_path=None, chart_b64=None):
         """
         Generate HTML content for the email that mimics the PDF report
         
@@ -27,13 +88,16 @@ class EmailService:
             user_name: Name of the user for the report
             pillar_scores: PillarScores object or dictionary with health scores
             chart_path: Path to the chart image to include in the email
+            chart_b64: Already base64-encoded chart PNG; used instead of reading chart_path
             
         Returns:
             HTML content as a string
         """
         # Convert chart path to base64 if provided
         chart_img_tag = ''
-        if chart_path and os.path.exists(chart_path):
+        if chart_b64:
+            chart_img_tag = f'<img src="data:image/png;base64,{chart_b64}" style="max-width: 500px; width: 100%; height: auto;" alt="Health Score Chart" />'
+        elif chart_path and os.path.exists(chart_path):
             try:
                 with open(chart_path, 'rb') as f:
                     chart_data = f.read()
@@ -52,51 +116,13 @@ class EmailService:
             else:
                 # Try to access attributes directly
                 try:
-                    scores = {
-                        'muscles_and_visceral_fat': getattr(pillar_scores, 'muscles_and_visceral_fat', 0),
-                        'cardio_vascular': getattr(pillar_scores, 'cardio_vascular', 0),
-                        'sleep': getattr(pillar_scores, 'sleep', 0),
-                        'cognitive': getattr(pillar_scores, 'cognitive', 0),
-                        'metabolic': getattr(pillar_scores, 'metabolic', 0),
-                        'emotional': getattr(pillar_scores, 'emotional', 0),
-                        'overall': getattr(pillar_scores, 'overall', 0)
-                    }
-                except Exception as e:
+                    scores = dict(zip(_SCORE_ATTRS, _score_get(pillar_scores)))
+                except AttributeError as e:
                     print(f"Error accessing pillar scores: {e}")
-                    scores = {
-                        'muscles_and_visceral_fat': 0,
-                        'cardio_vascular': 0,
-                        'sleep': 0,
-                        'cognitive': 0,
-                        'metabolic': 0,
-                        'emotional': 0,
-                        'overall': 0
-                    }
-        
-        # Create extremely minimal HTML content to avoid email client clipping
-        html = f"""
-        <h2>Your Health Score Report</h2>
-        <p>User: {user_name}</p>
-        <p>Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        
-        <div>
-            {chart_img_tag}
-        </div>
-        
-        <h3>Health Scores</h3>
-        
-        <p>Muscles and Visceral Fat: <strong>{scores['muscles_and_visceral_fat']}</strong></p>
-        <p>Cardiovascular Health: <strong>{scores['cardio_vascular']}</strong></p>
-        <p>Sleep: <strong>{scores['sleep']}</strong></p>
-        <p>Cognitive Health: <strong>{scores['cognitive']}</strong></p>
-        <p>Metabolic Health: <strong>{scores['metabolic']}</strong></p>
-        <p>Emotional Well-being: <strong>{scores['emotional']}</strong></p>
-        <p>Overall Score: <strong>{scores['overall']}</strong></p>
-        
-        <p>This report was generated automatically. Please do not reply to this email.</p>
-        """
+                    scores = dict.fromkeys(_SCORE_ATTRS, 0)
         
-        return html
+        html = _build_html(user_name, tuple(sorted(scores.items())), chart_img_tag)
+        return html.replace(_DATE_PLACEHOLDER, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 1)
     
     def send_email_with_pdf(self, to_email, subject, body, pdf_path, from_email=None, html_content=None, chart_path=None, pillar_scores=None):
         """
@@ -135,10 +161,14 @@ class EmailService:
             # Get sender email from environment if not provided
             sender = from_email or os.getenv('SENDGRID_FROM_EMAIL', 'no-reply@frontlab.io')
             
-            # Read and encode the PDF file
+            # Encode the PDF straight from a read-only mapping, so the raw bytes
+            # are paged in by the OS instead of copied into a Python bytes object
             with open(pdf_path, 'rb') as f:
-                data = f.read()
-                encoded_file = base64.b64encode(data).decode()
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        encoded_file = base64.b64encode(mm).decode('ascii')
+                else:
+                    encoded_file = ''
 
             # Create the attachment
             attached_file = Attachment(
@@ -169,8 +199,7 @@ class EmailService:
             message.attachment = attached_file
 
             # Send it
-            sg = SendGridAPIClient(self.api_key)
-            response = sg.send(message)
+            response = self._client.send(message)
             
             return {
                 'success': True,
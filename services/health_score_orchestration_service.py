@@ -27,7 +27,7 @@ class HealthScoreOrchestrationService:
             Dictionary with paths to generated files
         """
         try:
-            # Generate chart
+            # Generate chart; the file backs /view-chart and is embedded in the PDF
             chart_path = self.chart_service.generate_chart(pillar_scores)
             
             # Generate PDF report
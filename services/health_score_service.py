@@ -1,6 +1,21 @@
-import json
 import os
+from functools import lru_cache
 from models import PillarScores
+from utils import fastjson
+
+@lru_cache(maxsize=1)
+def _load_answer_map(path):
+    """
+    Load and parse the answer map, once per process
+    
+    Args:
+        path: Path to answer-map.json
+        
+    Returns:
+        Dictionary mapping question ref to answer scores
+    """
+    with open(path, 'rb') as f:
+        return fastjson.loads(f.read())
 
 class HealthScoreService:
     """Service for calculating health scores from typeform data"""
@@ -10,9 +25,8 @@ class HealthScoreService:
         answer_map_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'answer-map.json')
         
         try:
-            with open(answer_map_path, 'r') as f:
-                self._lookups = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            self._lookups = _load_answer_map(answer_map_path)
+        except (FileNotFoundError, fastjson.JSONDecodeError):
             # Fallback to default mappings if file not found or invalid
             print(f"Warning: Could not load answer map from {answer_map_path}. Using default mappings.")
             self._lookups = {}
@@ -45,6 +59,17 @@ class HealthScoreService:
         self._pillar6 = [  # Emotional Well-being
             "2c99731f-7ee5-4181-82b5-48a4d876df59"   # Sense of purpose
         ]
+        
+        # Map each question to the index of its pillar so answers are scored in one pass
+        pillars = [self._pillar1, self._pillar2, self._pillar3,
+                   self._pillar4, self._pillar5, self._pillar6]
+        self._pillar_of = {uuid: index for index, pillar in enumerate(pillars) for uuid in pillar}
+        
+        # Per question: exact answer lookup plus lower-cased keys for fuzzy matching
+        self._lookups_fast = {
+            uuid: (options, [(key.lower(), score) for key, score in options.items()])
+            for uuid, options in self._lookups.items()
+        }
     
     def calculate(self, typeform_payload):
         """Calculate health scores from typeform payload"""
@@ -52,39 +77,16 @@ class HealthScoreService:
         answers = self._extract_answers(typeform_payload)
         
         # Calculate raw scores for each pillar (0-5 scale)
-        raw_muscles_and_visceral_fat = self._calculate_pillar_score(answers, self._pillar1)
-        raw_cardio_vascular = self._calculate_pillar_score(answers, self._pillar2)
-        raw_sleep = self._calculate_pillar_score(answers, self._pillar3)
-        raw_cognitive = self._calculate_pillar_score(answers, self._pillar4)
-        raw_metabolic = self._calculate_pillar_score(answers, self._pillar5)
-        raw_emotional = self._calculate_pillar_score(answers, self._pillar6)
+        raw_scores = self._calculate_pillar_scores(answers)
         
         # Normalize scores to 0-100 scale
-        muscles_and_visceral_fat = self._normalize_score(raw_muscles_and_visceral_fat)
-        cardio_vascular = self._normalize_score(raw_cardio_vascular)
-        sleep = self._normalize_score(raw_sleep)
-        cognitive = self._normalize_score(raw_cognitive)
-        metabolic = self._normalize_score(raw_metabolic)
-        emotional = self._normalize_score(raw_emotional)
+        normalized = [round(raw_score * 20, 1) for raw_score in raw_scores]
         
         # Calculate overall score (average of all pillars)
-        overall = (muscles_and_visceral_fat + cardio_vascular + sleep + 
-                   cognitive + metabolic + emotional) / 6.0
+        overall = sum(normalized) / 6.0
         
         # Return pillar scores
-        return PillarScores(
-            muscles_and_visceral_fat,
-            cardio_vascular,
-            sleep,
-            cognitive,
-            metabolic,
-            emotional,
-            round(overall, 1)
-        )
-    
-    def _normalize_score(self, raw_score):
-        """Convert from 0-5 scale to 0-100 scale"""
-        return round(raw_score * 20, 1)
+        return PillarScores(*normalized, round(overall, 1))
     
     def _extract_answers(self, payload):
         """Extract answers from typeform payload"""
@@ -112,31 +114,38 @@ class HealthScoreService:
             print(f"Error extracting answers: {e}")
             return {}
     
-    def _calculate_pillar_score(self, answers, pillar_uuids):
-        """Calculate score for a specific pillar"""
-        scores = []
-        
-        for uuid in pillar_uuids:
-            if uuid in answers and uuid in self._lookups:
-                answer = answers[uuid]
-                # Try exact match first
-                if answer in self._lookups[uuid]:
-                    scores.append(self._lookups[uuid][answer])
-                else:
-                    # Try to find the best matching answer key
-                    # This is useful when the answer format might vary slightly
-                    best_match = None
-                    for key in self._lookups[uuid].keys():
-                        if answer.lower() in key.lower() or key.lower() in answer.lower():
-                            best_match = key
-                            break
-                    
-                    if best_match:
-                        scores.append(self._lookups[uuid][best_match])
-                    else:
-                        print(f"Warning: No matching answer found for {uuid}: {answer}")
-        
-        if not scores:
-            return 0
-        
-        return sum(scores) / len(scores)
+    def _calculate_pillar_scores(self, answers):
+        """Calculate the average score of every pillar in a single pass over the answers"""
+        sums = [0.0] * 6
+        counts = [0] * 6
+        pillar_of = self._pillar_of
+        lookups = self._lookups_fast
+        
+        for uuid, answer in answers.items():
+            index = pillar_of.get(uuid)
+            if index is None:
+                continue
+            lookup = lookups.get(uuid)
+            if lookup is None:
+                continue
+            
+            options, lowered = lookup
+            # Try exact match first
+            score = options.get(answer)
+            if score is None:
+                # Try to find the best matching answer key
+                # This is useful when the answer format might vary slightly
+                answer_lower = answer.lower()
+                for key_lower, key_score in lowered:
+                    if answer_lower in key_lower or key_lower in answer_lower:
+                        score = key_score
+                        break
+            
+            if score is None:
+                print(f"Warning: No matching answer found for {uuid}: {answer}")
+                continue
+            
+            sums[index] += score
+            counts[index] += 1
+        
+        return [total / count if count else 0 for total, count in zip(sums, counts)]
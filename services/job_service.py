@@ -0,0 +1,159 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import fastjson
+
+# Number of jobs whose status is kept for polling
+MAX_TRACKED_JOBS = 1000
+
+# Job states in which the job still depends on the process that accepted it
+_PENDING = ('queued', 'running')
+
+def _process_start(pid):
+    """
+    Identify a running process beyond its PID, which the OS may reuse
+
+    Args:
+        pid: Process ID
+
+    Returns:
+        Start time of the process in clock ticks since boot, '' where /proc
+        is unavailable, or None if no such process is running
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            # The command name may contain spaces, so split after its closing parenthesis
+            return f.read().rsplit(b')', 1)[1].split()[19].decode()
+    except FileNotFoundError:
+        if os.path.isdir('/proc/self'):
+            return None
+    except (OSError, IndexError):
+        pass
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return ''
+
+def _to_json(obj):
+    """Serialize objects such as PillarScores in job results"""
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    return str(obj)
+
+class JobService:
+    """Service for running request work on background threads and tracking its status"""
+
+    def __init__(self, db_path, max_workers=2):
+        """
+        Initialize the worker pool and the job store
+
+        Job records live in a SQLite database in WAL mode, so a job can be
+        polled through any worker process sharing the file, not only the
+        one running it.
+
+        Args:
+            db_path: Path to the SQLite database holding the job records
+            max_workers: Number of jobs that may run at the same time
+        """
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._owner = f'{os.getpid()}:{_process_start(os.getpid())}'
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                               'job_id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, '
+                               'owner TEXT NOT NULL, created REAL NOT NULL)')
+
+    def submit(self, fn, *args):
+        """
+        Queue a function call to run in the background
+
+        Args:
+            fn: Function to call; may return a dict or a (dict, status) tuple
+            *args: Arguments for the function
+
+        Returns:
+            ID of the queued job
+        """
+        job_id = secrets.token_hex(16)
+        with self._lock, self._conn:
+            self._conn.execute('INSERT INTO jobs (job_id, status, owner, created) VALUES (?, ?, ?, ?)',
+                               (job_id, 'queued', self._owner, time.time()))
+            # Forget the oldest jobs once too many are tracked
+            self._conn.execute('DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs '
+                               'ORDER BY created DESC LIMIT -1 OFFSET ?)', (MAX_TRACKED_JOBS,))
+        self._pool.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def get_status(self, job_id):
+        """
+        Get the status of a job
+
+        A job still queued or running in a worker process that has since
+        stopped is reported as failed, since nothing will ever finish it.
+
+        Args:
+            job_id: ID returned by submit
+
+        Returns:
+            Dictionary with the job status and, once done, its result; None if unknown
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT status, result, owner FROM jobs WHERE job_id = ?',
+                                     (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        status, result, owner = row
+        if status in _PENDING and not self._owner_alive(owner):
+            result = {'success': False, 'error': 'Job lost',
+                      'details': 'The worker process running the job stopped before it finished'}
+            self._update(job_id, status='failed', result=result)
+            return {'job_id': job_id, 'status': 'failed', 'result': result}
+
+        job = {'job_id': job_id, 'status': status}
+        if result is not None:
+            job['result'] = fastjson.loads(result)
+        return job
+
+    def _owner_alive(self, owner):
+        """Check whether the process that accepted a job is still running"""
+        if owner == self._owner:
+            return True
+        pid, start = owner.split(':', 1)
+        current = _process_start(int(pid))
+        if current is None:
+            return False
+        # Compare start times where /proc provides them, so a reused PID of
+        # a restarted worker does not count as the original process
+        return not start or not current or current == start
+
+    def _update(self, job_id, status, result=None):
+        """Update a tracked job, unless it has already been forgotten"""
+        encoded = fastjson.dumps(result, default=_to_json).decode('utf-8') if result is not None else None
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE jobs SET status = ?, result = ? WHERE job_id = ?',
+                               (status, encoded, job_id))
+
+    def _run(self, job_id, fn, args):
+        """Run a job and record its outcome"""
+        self._update(job_id, status='running')
+        try:
+            result = fn(*args)
+        except Exception as e:
+            print(f"Error running job {job_id}: {e}")
+            self._update(job_id, status='failed', result={'success': False, 'error': 'Job failed', 'details': str(e)})
+            return
+
+        if isinstance(result, tuple):
+            result = result[0]
+        self._update(job_id, status='finished' if result.get('success') else 'failed', result=result)
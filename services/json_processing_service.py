@@ -1,5 +1,10 @@
-import json
 from models import ProcessingResult
+from utils import fastjson
+from utils.typeform import load_answers
+
+# Field reference of the name question in the form
+# This is a placeholder - adjust based on actual field reference for name
+NAME_FIELD_REF = 'name_field_ref'
 
 class JsonProcessingService:
     """Service for processing JSON data from webhook"""
@@ -20,16 +25,42 @@ class JsonProcessingService:
         Process JSON content to calculate health scores and generate reports
         
         Args:
-            json_content: JSON string to process
+            json_content: JSON bytes to process, as read from a file or request
+                body; str is accepted but costs an extra encode for parsing
             filename: Optional filename for reference
             
         Returns:
             Dictionary with processing results
         """
         try:
-            # Parse JSON
-            payload = json.loads(json_content)
+            # Scoring only reads the answers, so only they are parsed and
+            # everything else is skipped; fall back to a full parse when no
+            # selective parser applies or the document lacks answers
+            payload = load_answers(json_content)
+            if payload is None:
+                # Bytes are parsed directly without decoding to str first
+                payload = fastjson.loads(json_content)
+        except Exception as e:
+            print(f"Error processing JSON: {e}")
+            return {
+                'success': False,
+                'message': f'Error processing JSON: {str(e)}'
+            }
+        
+        return self.process_json_obj(payload, filename)
+    
+    def process_json_obj(self, payload, filename=None):
+        """
+        Process an already parsed JSON payload to calculate health scores and generate reports
+        
+        Args:
+            payload: Parsed JSON payload (dictionary)
+            filename: Optional filename for reference
             
+        Returns:
+            Dictionary with processing results
+        """
+        try:
             # Extract user name if available
             user_name = self._extract_user_name(payload)
             
@@ -70,14 +101,15 @@ class JsonProcessingService:
         try:
             # Try to extract user name from form response
             # This is a placeholder implementation - adjust based on actual JSON structure
-            answers = payload.get('form_response', {}).get('answers', [])
+            try:
+                # Payloads nearly always carry answers, so index directly
+                # rather than building default dicts for .get
+                answers = payload['form_response']['answers']
+            except (KeyError, TypeError):
+                return "User"
             
-            # Look for name field in answers
-            for answer in answers:
-                # This is a placeholder - adjust based on actual field reference for name
-                if answer.get('field', {}).get('ref', '') == 'name_field_ref':
-                    return answer.get('text', 'User')
-            
-            return "User"
+            # Stop at the first answer to the name field
+            return next((answer.get('text', 'User') for answer in answers
+                         if answer.get('field', {}).get('ref') == NAME_FIELD_REF), "User")
         except Exception:
             return "User"
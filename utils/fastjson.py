@@ -0,0 +1,71 @@
+"""
+Fast JSON helpers
+
+Prefers orjson when it is installed and falls back to the stdlib json module
+otherwise. All serializers return bytes so callers can write them straight to
+disk or to a response body.
+"""
+import json
+from utils.files import write_atomic
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+# catch this regardless of which backend is active
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data):
+    """
+    Parse JSON from bytes or str
+
+    Args:
+        data: JSON document as bytes, bytearray, memoryview or str
+
+    Returns:
+        Parsed Python object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent=False, default=None):
+    """
+    Serialize an object to JSON bytes
+
+    Args:
+        obj: Object to serialize
+        indent: Pretty-print with two-space indentation
+        default: Function returning a serializable version of unsupported objects
+
+    Returns:
+        JSON document as UTF-8 bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(obj, indent=2, default=default).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), default=default).encode('utf-8')
+
+
+def dump_to_file(obj, path):
+    """
+    Serialize an object as indented JSON and write it to a file
+
+    The document is written with write_atomic, so readers never observe a
+    partially written file.
+
+    Args:
+        obj: Object to serialize
+        path: Destination file path
+
+    Returns:
+        The bytes written to the file
+    """
+    raw = dumps(obj, indent=True)
+    write_atomic(path, raw)
+    return raw
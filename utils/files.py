@@ -0,0 +1,32 @@
+"""
+File writing helpers
+
+Shared by the services and controllers that store payloads and generated
+artifacts which other threads and worker processes may read at any time.
+"""
+import os
+import threading
+
+
+def write_atomic(path, data):
+    """
+    Write bytes to a file so that readers never see it partially written
+
+    The data goes to a temporary sibling named after the writing process and
+    thread, then is renamed over the destination. The write uses an
+    unbuffered descriptor: the whole document normally goes out in one
+    syscall, looping only if the kernel accepts a partial write.
+
+    Args:
+        path: Destination file path
+        data: File contents as bytes
+    """
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
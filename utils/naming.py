@@ -0,0 +1,44 @@
+"""
+Filename helpers
+
+Builds the timestamped, randomized names used for stored payloads and
+generated artifacts without going through datetime.strftime.
+"""
+import secrets
+import time
+
+
+def utc_timestamp():
+    """
+    Format the current UTC time as YYYYMMDD_HHMMSS
+
+    Returns:
+        Timestamp string suitable for filenames
+    """
+    t = time.gmtime()
+    return f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}_{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}"
+
+
+def utc_date():
+    """
+    Format the current UTC date as YYYY-MM-DD
+
+    Returns:
+        Date string
+    """
+    t = time.gmtime()
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
+
+
+def unique_filename(prefix, extension):
+    """
+    Build a unique filename of the form <prefix>_<timestamp>_<random hex>.<extension>
+
+    Args:
+        prefix: Leading part of the filename
+        extension: File extension without the dot
+
+    Returns:
+        Filename string
+    """
+    return f"{prefix}_{utc_timestamp()}_{secrets.token_hex(8)}.{extension}"
@@ -0,0 +1,125 @@
+"""
+Typeform payload helpers
+
+Lookups shared by the controllers and routes that read Typeform
+form_response payloads.
+"""
+import io
+from typing import List, Optional, TypedDict, Union
+import ijson
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Payloads larger than this are stream-parsed when only the answers are
+# needed; below it a full parse is faster than the streaming parser
+STREAM_PARSE_MIN_SIZE = 256 * 1024
+
+# Reference ID of the email question in the health assessment form
+EMAIL_REF = '39f116ed-5403-407a-b506-c9625e9e6b2a'
+
+
+# The part of a form_response payload that scoring reads. Keys are
+# optional, as they are for the dict lookups downstream, and every other key
+# in the document is skipped by the decoder.
+class _Field(TypedDict, total=False):
+    ref: Optional[str]
+
+
+class _Choice(TypedDict, total=False):
+    label: Optional[str]
+
+
+class _Answer(TypedDict, total=False):
+    field: _Field
+    type: Optional[str]
+    text: Optional[str]
+    choice: _Choice
+    number: Union[int, float, None]
+
+
+class _FormResponse(TypedDict, total=False):
+    answers: List[_Answer]
+
+
+class _Payload(TypedDict, total=False):
+    form_response: _FormResponse
+
+
+_answers_decoder = msgspec.json.Decoder(_Payload) if msgspec is not None else None
+
+
+def index_answers_by_ref(answers):
+    """
+    Index form answers by their field reference in a single pass
+
+    Args:
+        answers: List of answer dictionaries from form_response.answers
+
+    Returns:
+        Dictionary mapping field ref to the first answer with that ref
+    """
+    index = {}
+    for answer in answers:
+        field = answer.get('field')
+        if field:
+            index.setdefault(field.get('ref'), answer)
+    return index
+
+
+def extract_email(payload):
+    """
+    Extract the respondent's email address from a Typeform payload
+
+    Args:
+        payload: Parsed webhook payload
+
+    Returns:
+        Email address if found, None otherwise
+    """
+    form_response = payload.get('form_response')
+    answers = form_response.get('answers') if form_response else None
+    if not answers:
+        return None
+
+    answer = index_answers_by_ref(answers).get(EMAIL_REF)
+    if answer and answer.get('type') == 'email':
+        return answer.get('email')
+    return None
+
+
+def load_answers(data):
+    """
+    Parse only form_response.answers from a serialized Typeform payload
+
+    With msgspec installed the document is decoded against the answer
+    fields scoring reads, in one pass and for any size. Otherwise documents
+    over STREAM_PARSE_MIN_SIZE are streamed. Either way, everything outside
+    the answers (form definition, hidden fields, variables, ...) is
+    validated but never built into Python objects.
+
+    Args:
+        data: JSON document as bytes or str
+
+    Returns:
+        Minimal payload of the form {'form_response': {'answers': [...]}},
+        keeping only the keys the document has, or None if the whole
+        document should be parsed instead: it is small and msgspec is not
+        installed, it has no answers, or its values do not fit the schema
+        (a null answers list or field, a number given as a string, ...)
+    """
+    if _answers_decoder is not None:
+        try:
+            return _answers_decoder.decode(data)
+        except msgspec.ValidationError:
+            # The lenient dict lookups downstream cope with these shapes
+            return None
+    if len(data) <= STREAM_PARSE_MIN_SIZE:
+        return None
+
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    answers = list(ijson.items(io.BytesIO(data), 'form_response.answers.item', use_float=True))
+    return {'form_response': {'answers': answers}} if answers else None